@@ -0,0 +1,49 @@
+"""
+Caches the Pronote fetch results on disk between runs.
+Lets a rerun on the same day (e.g. after a failed send) skip logging in to Pronote again.
+"""
+
+import hashlib
+import os
+import pickle
+import time
+from typing import Any, Optional
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pronote-report")
+
+
+def cache_path(pronote_url: str, username: str) -> str:
+    """Return the cache file for this account (the credentials themselves are not stored in the name)."""
+    digest = hashlib.sha256(f"{pronote_url}\0{username}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{digest}.pickle")
+
+
+def load_cache(path: str, key: tuple, max_age: float) -> Optional[Any]:
+    """
+    Return the data saved at `path`, or None if it is missing, unreadable, stale or for another key.
+
+    Args:
+        path: Cache file, usually from cache_path()
+        key: Must equal the key the data was saved with (e.g. the day and fetch options)
+        max_age: Maximum age of the cached data, in seconds
+    """
+    try:
+        with open(path, "rb") as f:
+            saved_key, saved_at, data = pickle.load(f)
+    except Exception:
+        return None  # No cache yet, or written by an incompatible version
+
+    if saved_key != key or time.time() - saved_at > max_age:
+        return None
+    return data
+
+
+def save_cache(path: str, key: tuple, data: Any) -> None:
+    """Atomically write `data` to `path` under `key`, readable by the current user only."""
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    # The data holds children's names and grades, so never let the umask widen access
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump((key, time.time(), data), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
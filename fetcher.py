@@ -3,11 +3,14 @@ Fetches grades from Pronote for all children linked to a parent account.
 """
 
 import datetime
+import functools
 import pronotepy
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from operator import attrgetter
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GradeEntry:
     child_name: str
     subject: str
@@ -23,7 +26,7 @@ class GradeEntry:
     min: str = ""
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class HomeworkEntry:
     child_name: str
     subject: str
@@ -32,7 +35,7 @@ class HomeworkEntry:
     done: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TimetableEntry:
     child_name: str
     subject: str
@@ -43,6 +46,208 @@ class TimetableEntry:
     room: str = ""
 
 
+def _login(pronote_url: str, username: str, password: str) -> pronotepy.ParentClient:
+    """Open a parent session on Pronote, raising if the credentials are rejected."""
+    client = pronotepy.ParentClient(pronote_url, username=username, password=password)
+    if not client.logged_in:
+        raise RuntimeError("Pronote login failed — check URL, username, and password")
+    return client
+
+
+# One logged-in client per account for the life of the process, so the fetch_* helpers
+# called one after another share a single login. Parallel workers in fetch_all still
+# call _login() directly, as they need a session of their own.
+_get_client = functools.lru_cache(maxsize=2)(_login)
+
+
+def clear_client_cache() -> None:
+    """Forget the memoized Pronote sessions (and the credentials they were keyed on)."""
+    _get_client.cache_clear()
+
+
+def _child_grades(
+    client: pronotepy.ParentClient,
+    child_name: str,
+    cutoff: datetime.date,
+) -> list[GradeEntry]:
+    """Grades of the currently selected child dated on or after `cutoff`, newest first."""
+    # Filter before building entries so older grades never cost a GradeEntry
+    _GradeEntry = GradeEntry
+    grades: list[GradeEntry] = [
+        _GradeEntry(
+            child_name=child_name,
+            subject=g.subject.name if g.subject else "—",
+            grade=g.grade,
+            out_of=g.out_of,
+            coefficient=g.coefficient,
+            comment=g.comment or "",
+            date=g.date,
+            period=period.name,
+            is_bonus=g.is_bonus,
+            average=g.average,
+            max=g.max,
+            min=g.min,
+        )
+        for period in client.periods
+        for g in period.grades
+        if g.date >= cutoff
+    ]
+
+    grades.sort(key=attrgetter("date"), reverse=True)
+    return grades
+
+
+def _child_homeworks(
+    client: pronotepy.ParentClient,
+    child_name: str,
+    today: datetime.date,
+    cutoff: datetime.date,
+) -> list[HomeworkEntry]:
+    """Homeworks of the currently selected child due between `today` and `cutoff`."""
+    homeworks: list[HomeworkEntry] = []
+    # Try to get homeworks - homework() requires date_from parameter; date_to keeps
+    # Pronote from returning the rest of the school year
+    try:
+        if callable(client.homework):
+            for hw in client.homework(date_from=today, date_to=cutoff):
+                try:
+                    # Homework object uses 'date' for due date
+                    due_date = hw.date
+                    if due_date is None or due_date < today or due_date > cutoff:
+                        continue
+                    homeworks.append(
+                        HomeworkEntry(
+                            child_name=child_name,
+                            subject=hw.subject.name if hw.subject else "—",
+                            description=hw.description or "",
+                            due_date=due_date,
+                            done=hw.done,
+                        )
+                    )
+                except Exception:
+                    pass
+    except Exception:
+        pass  # Silently fail if homework is not available
+
+    homeworks.sort(key=attrgetter("due_date"))
+    return homeworks
+
+
+def _child_timetable(
+    client: pronotepy.ParentClient,
+    child_name: str,
+    today: datetime.date,
+    cutoff: datetime.date,
+) -> list[TimetableEntry]:
+    """Lessons of the currently selected child between `today` and `cutoff`."""
+    timetable: list[TimetableEntry] = []
+    # Try to get timetable - lessons() requires date_from parameter; date_to is exclusive
+    # of that day's lessons (compared against midnight), hence the extra day
+    try:
+        if callable(client.lessons):
+            for lesson in client.lessons(date_from=today, date_to=cutoff + datetime.timedelta(days=1)):
+                try:
+                    if lesson.start is None:
+                        continue
+                    lesson_date = lesson.start.date()
+                    if lesson_date < today or lesson_date > cutoff:
+                        continue
+                    # Lesson object may not have teacher attribute
+                    teacher_name = ""
+                    timetable.append(
+                        TimetableEntry(
+                            child_name=child_name,
+                            subject=lesson.subject.name if lesson.subject else "—",
+                            teacher=teacher_name,
+                            start_time=lesson.start.time(),
+                            end_time=lesson.end.time(),
+                            date=lesson_date,
+                            room=lesson.classroom or "",
+                        )
+                    )
+                except Exception:
+                    pass
+    except Exception:
+        pass  # Silently fail if timetable is not available
+
+    timetable.sort(key=attrgetter("date", "start_time"))
+    return timetable
+
+
+def fetch_all(
+    pronote_url: str,
+    username: str,
+    password: str,
+    grade_days: int = 14,
+    ahead_days: int = 7,
+    include_homeworks: bool = True,
+    include_timetable: bool = True,
+) -> tuple[
+    dict[str, list[GradeEntry]],
+    dict[str, list[HomeworkEntry]],
+    dict[str, list[TimetableEntry]],
+]:
+    """
+    Log in once as a parent and return grades, homeworks and timetable per child.
+
+    With several children, each child is fetched in its own thread; the extra
+    threads open their own session since Pronote tracks the selected child
+    server-side.
+
+    Args:
+        pronote_url: Full URL to the Pronote parent page
+                     e.g. "https://YOUR_SCHOOL.index-education.net/pronote/parent.html"
+        username: Pronote username
+        password: Pronote password
+        grade_days: How many days back to look for grades (default: 14)
+        ahead_days: How many days ahead to look for homeworks and lessons (default: 7)
+        include_homeworks: Whether to fetch homeworks (default: True)
+        include_timetable: Whether to fetch the timetable (default: True)
+
+    Returns:
+        (grades, homeworks, timetable), each a dict mapping child full name to its
+        entries. Sections that were not requested are returned as empty dicts.
+    """
+    client = _get_client(pronote_url, username, password)
+
+    today = datetime.date.today()
+    grade_cutoff = today - datetime.timedelta(days=grade_days)
+    ahead_cutoff = today + datetime.timedelta(days=ahead_days)
+
+    def fetch_child(index: int) -> tuple[str, list[GradeEntry], list[HomeworkEntry], list[TimetableEntry]]:
+        # set_child() mutates the session, so each extra worker needs its own login
+        worker = client if index == 0 else _login(pronote_url, username, password)
+        child = worker.children[index]
+        worker.set_child(child)
+        child_name = child.name
+        return (
+            child_name,
+            _child_grades(worker, child_name, grade_cutoff),
+            _child_homeworks(worker, child_name, today, ahead_cutoff) if include_homeworks else [],
+            _child_timetable(worker, child_name, today, ahead_cutoff) if include_timetable else [],
+        )
+
+    n_children = len(client.children)
+    if n_children <= 1:
+        per_child = [fetch_child(i) for i in range(n_children)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(n_children, 4)) as executor:
+            per_child = list(executor.map(fetch_child, range(n_children)))
+
+    grades: dict[str, list[GradeEntry]] = {}
+    homeworks: dict[str, list[HomeworkEntry]] = {}
+    timetable: dict[str, list[TimetableEntry]] = {}
+
+    for child_name, child_grades, child_homeworks, child_timetable in per_child:
+        grades[child_name] = child_grades
+        if include_homeworks:
+            homeworks[child_name] = child_homeworks
+        if include_timetable:
+            timetable[child_name] = child_timetable
+
+    return grades, homeworks, timetable
+
+
 def fetch_grades(
     pronote_url: str,
     username: str,
@@ -62,41 +267,14 @@ def fetch_grades(
     Returns:
         dict mapping child full name -> list of GradeEntry sorted by date desc
     """
-    client = pronotepy.ParentClient(pronote_url, username=username, password=password)
-    if not client.logged_in:
-        raise RuntimeError("Pronote login failed — check URL, username, and password")
+    client = _get_client(pronote_url, username, password)
 
     cutoff = datetime.date.today() - datetime.timedelta(days=days)
     results: dict[str, list[GradeEntry]] = {}
 
     for child in client.children:
         client.set_child(child)
-        child_name = child.name
-
-        grades: list[GradeEntry] = []
-        for period in client.periods:
-            for g in period.grades:
-                if g.date < cutoff:
-                    continue
-                grades.append(
-                    GradeEntry(
-                        child_name=child_name,
-                        subject=g.subject.name if g.subject else "—",
-                        grade=g.grade,
-                        out_of=g.out_of,
-                        coefficient=g.coefficient,
-                        comment=g.comment or "",
-                        date=g.date,
-                        period=period.name,
-                        is_bonus=g.is_bonus,
-                        average=g.average,
-                        max=g.max,
-                        min=g.min,
-                    )
-                )
-
-        grades.sort(key=lambda x: x.date, reverse=True)
-        results[child_name] = grades
+        results[child.name] = _child_grades(client, child.name, cutoff)
 
     return results
 
@@ -119,9 +297,7 @@ def fetch_homeworks(
     Returns:
         dict mapping child full name -> list of HomeworkEntry sorted by due_date
     """
-    client = pronotepy.ParentClient(pronote_url, username=username, password=password)
-    if not client.logged_in:
-        raise RuntimeError("Pronote login failed — check URL, username, and password")
+    client = _get_client(pronote_url, username, password)
 
     today = datetime.date.today()
     cutoff = today + datetime.timedelta(days=days)
@@ -129,35 +305,7 @@ def fetch_homeworks(
 
     for child in client.children:
         client.set_child(child)
-        child_name = child.name
-
-        homeworks: list[HomeworkEntry] = []
-        # Try to get homeworks - homework() requires date_from parameter
-        try:
-            if callable(client.homework):
-                hw_list = list(client.homework(date_from=today))
-                for hw in hw_list:
-                    try:
-                        # Homework object uses 'date' for due date
-                        due_date = hw.date
-                        if due_date is None or due_date < today or due_date > cutoff:
-                            continue
-                        homeworks.append(
-                            HomeworkEntry(
-                                child_name=child_name,
-                                subject=hw.subject.name if hw.subject else "—",
-                                description=hw.description or "",
-                                due_date=due_date,
-                                done=hw.done,
-                            )
-                        )
-                    except Exception:
-                        pass
-        except Exception:
-            pass  # Silently fail if homework is not available
-
-        homeworks.sort(key=lambda x: x.due_date)
-        results[child_name] = homeworks
+        results[child.name] = _child_homeworks(client, child.name, today, cutoff)
 
     return results
 
@@ -180,9 +328,7 @@ def fetch_timetable(
     Returns:
         dict mapping child full name -> list of TimetableEntry sorted by date and time
     """
-    client = pronotepy.ParentClient(pronote_url, username=username, password=password)
-    if not client.logged_in:
-        raise RuntimeError("Pronote login failed — check URL, username, and password")
+    client = _get_client(pronote_url, username, password)
 
     today = datetime.date.today()
     cutoff = today + datetime.timedelta(days=days)
@@ -190,36 +336,6 @@ def fetch_timetable(
 
     for child in client.children:
         client.set_child(child)
-        child_name = child.name
-
-        timetable: list[TimetableEntry] = []
-        # Try to get timetable - lessons() requires date_from parameter
-        try:
-            if callable(client.lessons):
-                lessons_list = list(client.lessons(date_from=today))
-                for lesson in lessons_list:
-                    try:
-                        if lesson.start is None or lesson.start.date() < today or lesson.start.date() > cutoff:
-                            continue
-                        # Lesson object may not have teacher attribute
-                        teacher_name = ""
-                        timetable.append(
-                            TimetableEntry(
-                                child_name=child_name,
-                                subject=lesson.subject.name if lesson.subject else "—",
-                                teacher=teacher_name,
-                                start_time=lesson.start.time(),
-                                end_time=lesson.end.time(),
-                                date=lesson.start.date(),
-                                room=lesson.classroom or "",
-                            )
-                        )
-                    except Exception:
-                        pass
-        except Exception:
-            pass  # Silently fail if timetable is not available
-
-        timetable.sort(key=lambda x: (x.date, x.start_time))
-        results[child_name] = timetable
+        results[child.name] = _child_timetable(client, child.name, today, cutoff)
 
     return results
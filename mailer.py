@@ -7,34 +7,112 @@ import os
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from typing import Callable, Optional, Union
+
+# An email body, either ready-made or built on demand when the message is assembled
+Body = Union[str, Callable[[], str], None]
+
+
+def _materialize(body: Body) -> Optional[str]:
+    return body() if callable(body) else body
+
+
+class MailerSession:
+    """
+    A logged-in Gmail SMTP connection that can send several messages.
+
+    Use it as a context manager so the TLS handshake and login happen once:
+
+        with MailerSession() as mailer:
+            mailer.send(subject, text_body, html_body)
+
+    Required env vars:
+        GMAIL_ADDRESS      — your Gmail address, e.g. "you@gmail.com"
+        GMAIL_APP_PASSWORD — 16-char app password from Google account settings
+    """
+
+    def __init__(self) -> None:
+        self.gmail_address = os.environ["GMAIL_ADDRESS"]
+        self._app_password = os.environ["GMAIL_APP_PASSWORD"]
+        self._server: Optional[smtplib.SMTP_SSL] = None
+
+    def __enter__(self) -> "MailerSession":
+        self._server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
+        try:
+            self._server.login(self.gmail_address, self._app_password)
+        except Exception:
+            self._server.close()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            # Like smtplib's own context manager: a dropped connection must not mask
+            # the error that ended the block, and the socket is always closed
+            try:
+                server.quit()
+            except smtplib.SMTPServerDisconnected:
+                pass
+            finally:
+                server.close()
+
+    def send(
+        self,
+        subject: str,
+        text_body: Body,
+        html_body: Body,
+        recipients: Optional[list[str]] = None,
+    ) -> None:
+        """
+        Send one multipart (text + HTML) message on the open connection.
+
+        Args:
+            subject: Email subject
+            text_body: Plain-text version of the report, or a callable returning it
+            html_body: HTML version of the report, or a callable returning it
+            recipients: Recipient addresses (default: parsed from EMAIL_TO)
+
+        Callables are only invoked here, and a body given as None is left out,
+        so callers can skip building a version nobody will read.
+        """
+        if self._server is None:
+            raise RuntimeError("MailerSession.send() must be called inside a 'with' block")
+        if text_body is None and html_body is None:
+            raise ValueError("At least one of text_body and html_body is required")
+
+        if recipients is None:
+            recipients = [r.strip() for r in os.environ["EMAIL_TO"].split(",")]
+
+        msg = MIMEMultipart("alternative")
+        msg["From"] = self.gmail_address
+        msg["To"] = ", ".join(recipients)
+        msg["Subject"] = subject
+        if text_body is not None:
+            msg.attach(MIMEText(_materialize(text_body), "plain", "utf-8"))
+        if html_body is not None:
+            msg.attach(MIMEText(_materialize(html_body), "html", "utf-8"))
+
+        self._server.sendmail(self.gmail_address, recipients, msg.as_string())
+
+        print(f"Email sent to {', '.join(recipients)}")
 
 
 def send_report(
     subject: str,
-    text_body: str,
-    html_body: str,
+    text_body: Body,
+    html_body: Body,
 ) -> None:
     """
     Send the report via Gmail SMTP.
 
+    Either body may be a callable, built only when the message is assembled,
+    or None to leave that version out.
+
     Required env vars:
         GMAIL_ADDRESS      — your Gmail address, e.g. "you@gmail.com"
         GMAIL_APP_PASSWORD — 16-char app password from Google account settings
         EMAIL_TO           — recipient address (can be the same as GMAIL_ADDRESS)
     """
-    gmail_address = os.environ["GMAIL_ADDRESS"]
-    app_password = os.environ["GMAIL_APP_PASSWORD"]
-    recipients = [r.strip() for r in os.environ["EMAIL_TO"].split(",")]
-
-    msg = MIMEMultipart("alternative")
-    msg["From"] = gmail_address
-    msg["To"] = ", ".join(recipients)
-    msg["Subject"] = subject
-    msg.attach(MIMEText(text_body, "plain", "utf-8"))
-    msg.attach(MIMEText(html_body, "html", "utf-8"))
-
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(gmail_address, app_password)
-        server.sendmail(gmail_address, recipients, msg.as_string())
-
-    print(f"Email sent to {', '.join(recipients)}")
+    with MailerSession() as mailer:
+        mailer.send(subject, text_body, html_body)
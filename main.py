@@ -15,6 +15,10 @@ Required env vars (set in .env locally, or GitHub Actions secrets in CI):
 Optional report sections:
     INCLUDE_HOMEWORKS      — set to "true" to include homeworks in report (default: false)
     INCLUDE_TIMETABLE      — set to "true" to include timetable in report (default: false)
+    REPORT_FORMAT          — "html", "text" or "both": email body parts to build and send (default: both)
+
+Optional cache:
+    PRONOTE_CACHE_TTL      — minutes to reuse today's fetched data from ~/.cache/pronote-report (default: 0, disabled)
 
 Optional WhatsApp vars (requires Meta WhatsApp Business API):
     WHATSAPP_ENABLED       — set to "true" to enable WhatsApp sending (default: false)
@@ -27,85 +31,141 @@ Optional WhatsApp vars (requires Meta WhatsApp Business API):
 import datetime
 import os
 import sys
+import threading
 
-from dotenv import load_dotenv
-
-from fetcher import fetch_grades, fetch_homeworks, fetch_timetable
+from cache import cache_path, load_cache, save_cache
+from fetcher import clear_client_cache, fetch_all
 from mailer import send_report
-from report import build_html_report, build_text_report
-from whatsapp_sender import send_whatsapp_instant, send_whatsapp_group
+from report import build_date_cache, build_html_report, build_text_report, group_by_subject, prepare_grades
 
 DAYS = 14
 
 
 def main() -> None:
-    load_dotenv()
+    # Under GitHub Actions the variables come from secrets, so only load dotenv for a local .env
+    env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+    if os.path.exists(env_path):
+        from dotenv import load_dotenv
+
+        load_dotenv(env_path)
 
     pronote_url = os.environ["PRONOTE_URL"]
     username = os.environ["PRONOTE_USERNAME"]
     password = os.environ["PRONOTE_PASSWORD"]
 
-    print("Connecting to Pronote…")
-    try:
-        grades_by_child = fetch_grades(pronote_url, username, password, days=DAYS)
-    except Exception as exc:
-        print(f"ERROR: could not fetch grades — {exc}", file=sys.stderr)
-        sys.exit(1)
-
-    total = sum(len(g) for g in grades_by_child.values())
-    print(f"Fetched {total} grade(s) across {len(grades_by_child)} child(ren).")
-
     include_homeworks = os.environ.get("INCLUDE_HOMEWORKS", "false").lower() == "true"
     include_timetable = os.environ.get("INCLUDE_TIMETABLE", "false").lower() == "true"
+    report_format = (os.environ.get("REPORT_FORMAT") or "both").lower()
+    if report_format not in ("html", "text", "both"):
+        print(f"WARNING: unknown REPORT_FORMAT '{report_format}', sending both", file=sys.stderr)
+        report_format = "both"
 
-    if include_homeworks:
-        try:
-            homeworks_by_child = fetch_homeworks(pronote_url, username, password, days=7)
-        except Exception as exc:
-            print(f"WARNING: could not fetch homeworks — {exc}", file=sys.stderr)
-            homeworks_by_child = {}
-    else:
-        homeworks_by_child = {}
+    try:
+        cache_ttl = int(os.environ.get("PRONOTE_CACHE_TTL") or 0)
+    except ValueError:
+        print(f"WARNING: invalid PRONOTE_CACHE_TTL '{os.environ['PRONOTE_CACHE_TTL']}', cache disabled", file=sys.stderr)
+        cache_ttl = 0
 
-    if include_timetable:
+    today = datetime.date.today()
+    cache_file = cache_path(pronote_url, username)
+    cache_key = (today.isoformat(), DAYS, include_homeworks, include_timetable)
+    cached = load_cache(cache_file, cache_key, max_age=cache_ttl * 60) if cache_ttl > 0 else None
+
+    if cached is not None:
+        print("Using cached Pronote data…")
+        grades_by_child, homeworks_by_child, timetable_by_child = cached
+    else:
+        print("Connecting to Pronote…")
         try:
-            timetable_by_child = fetch_timetable(pronote_url, username, password, days=7)
+            grades_by_child, homeworks_by_child, timetable_by_child = fetch_all(
+                pronote_url,
+                username,
+                password,
+                grade_days=DAYS,
+                ahead_days=7,
+                include_homeworks=include_homeworks,
+                include_timetable=include_timetable,
+            )
         except Exception as exc:
-            print(f"WARNING: could not fetch timetable — {exc}", file=sys.stderr)
-            timetable_by_child = {}
+            print(f"ERROR: could not fetch grades — {exc}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            clear_client_cache()
+
+        if cache_ttl > 0:
+            try:
+                save_cache(cache_file, cache_key, (grades_by_child, homeworks_by_child, timetable_by_child))
+            except OSError as exc:
+                print(f"WARNING: could not write cache — {exc}", file=sys.stderr)
+
+    total = sum(len(g) for g in grades_by_child.values())
+    print(f"Fetched {total} grade(s) across {len(grades_by_child)} child(ren).")
+
+    date_cache = build_date_cache(grades_by_child)
+    whatsapp_enabled = os.environ.get("WHATSAPP_ENABLED", "false").lower() == "true"
+    # The newest-first view is only read by the WhatsApp report
+    if whatsapp_enabled:
+        by_date_desc, grouped_by_child = prepare_grades(grades_by_child)
     else:
-        timetable_by_child = {}
+        grouped_by_child = {child_name: group_by_subject(grades) for child_name, grades in grades_by_child.items()}
 
-    text_body = build_text_report(grades_by_child, homeworks_by_child, timetable_by_child, days=DAYS)
-    html_body = build_html_report(grades_by_child, homeworks_by_child, timetable_by_child, days=DAYS)
+    # Reports are only built when something actually reads them; only the email thread does
+    def text_body() -> str:
+        return build_text_report(
+            grades_by_child, homeworks_by_child, timetable_by_child,
+            days=DAYS, date_cache=date_cache, today=today, grouped_by_child=grouped_by_child,
+        )
+
+    def html_body() -> str:
+        return build_html_report(
+            grades_by_child, homeworks_by_child, timetable_by_child,
+            days=DAYS, date_cache=date_cache, today=today, grouped_by_child=grouped_by_child,
+        )
 
-    today = datetime.date.today()
     subject = f"Rapport Pronote — semaine du {(today - datetime.timedelta(days=DAYS)).strftime('%d/%m')} au {today.strftime('%d/%m/%Y')}"
 
+    # Send the email in the background so its SMTP round trips overlap with WhatsApp
+    email_errors: list[Exception] = []
+
+    def send_email() -> None:
+        try:
+            send_report(
+                subject=subject,
+                text_body=text_body if report_format != "html" else None,
+                html_body=html_body if report_format != "text" else None,
+            )
+        except Exception as exc:
+            email_errors.append(exc)
+
     print("Sending email…")
-    try:
-        send_report(subject=subject, text_body=text_body, html_body=html_body)
-    except Exception as exc:
-        print(f"ERROR: could not send email — {exc}", file=sys.stderr)
-        sys.exit(1)
+    email_thread = threading.Thread(target=send_email)
+    email_thread.start()
 
     # Send WhatsApp message if configured
-    whatsapp_enabled = os.environ.get("WHATSAPP_ENABLED", "false").lower() == "true"
     if whatsapp_enabled:
         print("Sending WhatsApp message…")
         try:
+            from whatsapp_sender import send_whatsapp_group, send_whatsapp_instant
+
+            # The WhatsApp text is built from grades_by_child; text_body is only its fallback
+            # when no grades are given, so the text report is not built for it.
             # Check if it's a group message or individual message
-            group_numbers = os.environ.get("WHATSAPP_GROUP_NUMBERS")
+            group_numbers = [n.strip() for n in os.environ.get("WHATSAPP_GROUP_NUMBERS", "").split(",") if n.strip()]
             if group_numbers:
-                send_whatsapp_group(subject=subject, text_body=text_body, group_id=group_numbers, 
-                                  grades_by_child=grades_by_child, days=DAYS)
+                send_whatsapp_group(subject=subject, text_body="", group_id=group_numbers, 
+                                  grades_by_child=grades_by_child, days=DAYS, by_date_desc=by_date_desc)
             else:
-                send_whatsapp_instant(subject=subject, text_body=text_body, 
-                                    grades_by_child=grades_by_child, days=DAYS)
+                send_whatsapp_instant(subject=subject, text_body="", 
+                                    grades_by_child=grades_by_child, days=DAYS, by_date_desc=by_date_desc)
         except Exception as exc:
             print(f"ERROR: could not send WhatsApp message — {exc}", file=sys.stderr)
-            # Don't exit on WhatsApp error, email was already sent successfully
-    
+            # Don't exit on WhatsApp error, only an email failure fails the run
+
+    email_thread.join()
+    if email_errors:
+        print(f"ERROR: could not send email — {email_errors[0]}", file=sys.stderr)
+        sys.exit(1)
+
     print("Done.")
 
 
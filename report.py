@@ -3,40 +3,131 @@ Formats the grades data into a plain-text and HTML email report.
 """
 
 import datetime
+import functools
+import itertools
+import re
+import string
 from html import escape
+from operator import attrgetter
+from typing import IO, Callable, Iterator
 
 from fetcher import GradeEntry, HomeworkEntry, TimetableEntry
 
 _WEEKDAYS_FR = ["Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim"]
 
+# Separator lines of the text and WhatsApp reports
+_SEP_EQ_60 = "=" * 60
+_SEP_DASH_60 = "─" * 60
+_SEP_DASH_30 = "─" * 30
+_SEP_EQ_50 = "=" * 50
 
+# Characters html.escape() rewrites (with quote=True)
+_HTML_UNSAFE_RE = re.compile(r"[&<>\"']")
+
+
+def _esc(s: str) -> str:
+    """html.escape() that returns the string untouched when it has nothing to escape."""
+    return escape(s) if _HTML_UNSAFE_RE.search(s) else s
+
+
+@functools.lru_cache(maxsize=512)
 def _fmt_date(d: datetime.date) -> str:
     return f"{_WEEKDAYS_FR[d.weekday()]} {d.day:02d}/{d.month:02d}"
 
 
+@functools.lru_cache(maxsize=512)
 def _fmt_date_whatsapp(d: datetime.date) -> str:
     """Format date for WhatsApp without day abbreviation."""
     return f"{d.day:02d}/{d.month:02d}"
 
 
-def _grade_line(g: GradeEntry) -> str:
-    bonus_tag = " [BONUS]" if g.is_bonus else ""
-    comment = f" — {g.comment}" if g.comment else ""
-    coeff = f" (coeff {g.coefficient})" if g.coefficient and g.coefficient != "1" else ""
-    avg = f"  moy. classe {g.average}" if g.average else ""
-    return (
-        f"  {_fmt_date(g.date)}  {g.subject:<25} {g.grade}/{g.out_of}{coeff}{avg}{bonus_tag}{comment}"
+def _fmt_ymd(d: datetime.date) -> str:
+    """Format a date as DD/MM/YYYY (same as strftime('%d/%m/%Y'), without the locale machinery)."""
+    return f"{d.day:02d}/{d.month:02d}/{d.year}"
+
+
+@functools.lru_cache(maxsize=256)
+def _fmt_hm(t: datetime.time) -> str:
+    """Format a lesson time as HH:MM; lessons start and end on a handful of distinct times."""
+    return f"{t.hour:02d}:{t.minute:02d}"
+
+
+def build_date_cache(
+    grades_by_child: dict[str, list[GradeEntry]],
+    fmt: Callable[[datetime.date], str] = _fmt_date,
+) -> dict[datetime.date, str]:
+    """Format each distinct grade date once, for sharing across the report builders."""
+    unique_dates = {g.date for grades in grades_by_child.values() for g in grades}
+    return {d: fmt(d) for d in unique_dates}
+
+
+def group_by_subject(grades: list[GradeEntry]) -> list[tuple[str, list[GradeEntry]]]:
+    """Group grades by subject (alphabetical), keeping each subject's grades in their original order."""
+    grades_sorted = sorted(grades, key=lambda g: g.subject)
+    return [(subject, list(sg)) for subject, sg in itertools.groupby(grades_sorted, key=lambda g: g.subject)]
+
+
+# Grade line templates; the subject is passed in already padded to 25 columns.
+# The _MIN variants skip the optional segments when a grade has none of them.
+_LINE_FULL = "  {date}  {subject} {grade}/{out_of}{coeff}{avg}{bonus}{comment}"
+_LINE_MIN = "  {date}  {subject} {grade}/{out_of}"
+_LINE_WHATSAPP_FULL = "{subject} — {date}: {grade}/{out_of}{coeff}{avg}{bonus}{comment}"
+_LINE_WHATSAPP_MIN = "{subject} — {date}: {grade}/{out_of}"
+
+
+def _has_extras(g: GradeEntry) -> bool:
+    return bool(g.is_bonus or g.comment or g.average or (g.coefficient and g.coefficient != "1"))
+
+
+def prepare_grades(
+    grades_by_child: dict[str, list[GradeEntry]],
+) -> tuple[dict[str, list[GradeEntry]], dict[str, list[tuple[str, list[GradeEntry]]]]]:
+    """
+    Sort and group every child's grades once, for reuse by all the report builders.
+
+    Returns:
+        (by_date_desc, grouped_by_child): per child, the grades newest first, and the
+        grades grouped by subject as returned by group_by_subject()
+    """
+    by_date_desc = {
+        child_name: sorted(grades, key=attrgetter("date"), reverse=True)
+        for child_name, grades in grades_by_child.items()
+    }
+    grouped_by_child = {child_name: group_by_subject(grades) for child_name, grades in by_date_desc.items()}
+    return by_date_desc, grouped_by_child
+
+
+def _grade_line(g: GradeEntry, date_str: str, padded_subject: str | None = None) -> str:
+    subject = padded_subject if padded_subject is not None else f"{g.subject:<25}"
+    if not _has_extras(g):
+        return _LINE_MIN.format(date=date_str, subject=subject, grade=g.grade, out_of=g.out_of)
+    return _LINE_FULL.format(
+        date=date_str,
+        subject=subject,
+        grade=g.grade,
+        out_of=g.out_of,
+        coeff=f" (coeff {g.coefficient})" if g.coefficient and g.coefficient != "1" else "",
+        avg=f"  moy. classe {g.average}" if g.average else "",
+        bonus=" [BONUS]" if g.is_bonus else "",
+        comment=f" — {g.comment}" if g.comment else "",
     )
 
 
-def _grade_line_whatsapp(g: GradeEntry) -> str:
+def _grade_line_whatsapp(g: GradeEntry, date_str: str) -> str:
     """Format grade line for WhatsApp with subject at start, no day abbreviation, and colon separator."""
-    bonus_tag = " [BONUS]" if g.is_bonus else ""
-    comment = f" — {g.comment}" if g.comment else ""
-    coeff = f" (coeff {g.coefficient})" if g.coefficient and g.coefficient != "1" else ""
-    avg = f"  moy. {g.average}" if g.average else ""
-    return (
-        f"{g.subject:<25} {_fmt_date_whatsapp(g.date)}: {g.grade}/{g.out_of}{coeff}{avg}{bonus_tag}{comment}"
+    # No column padding: WhatsApp uses a proportional font, and Meta bills by length
+    subject = g.subject
+    if not _has_extras(g):
+        return _LINE_WHATSAPP_MIN.format(subject=subject, date=date_str, grade=g.grade, out_of=g.out_of)
+    return _LINE_WHATSAPP_FULL.format(
+        subject=subject,
+        date=date_str,
+        grade=g.grade,
+        out_of=g.out_of,
+        coeff=f" (coeff {g.coefficient})" if g.coefficient and g.coefficient != "1" else "",
+        avg=f"  moy. {g.average}" if g.average else "",
+        bonus=" [BONUS]" if g.is_bonus else "",
+        comment=f" — {g.comment}" if g.comment else "",
     )
 
 
@@ -45,32 +136,39 @@ def build_text_report(
     homeworks_by_child: dict[str, list[HomeworkEntry]] | None = None,
     timetable_by_child: dict[str, list[TimetableEntry]] | None = None,
     days: int = 14,
+    date_cache: dict[datetime.date, str] | None = None,
+    today: datetime.date | None = None,
+    grouped_by_child: dict[str, list[tuple[str, list[GradeEntry]]]] | None = None,
 ) -> str:
-    today = datetime.date.today()
+    if today is None:
+        today = datetime.date.today()
+    if date_cache is None:
+        date_cache = build_date_cache(grades_by_child)
     lines = [
         "Rapport Pronote",
         f"Du {_fmt_date(today - datetime.timedelta(days=days))} au {_fmt_date(today)}",
-        "=" * 60,
+        _SEP_EQ_60,
     ]
 
     for child_name, grades in grades_by_child.items():
-        lines.append(f"\n{'─' * 60}")
+        lines.append("\n" + _SEP_DASH_60)
         lines.append(f"  {child_name}")
-        lines.append(f"{'─' * 60}")
+        lines.append(_SEP_DASH_60)
 
         # Add timetable first
         if timetable_by_child and child_name in timetable_by_child:
             timetable = timetable_by_child[child_name]
             if timetable:
                 lines.append("\n  EMPLOI DU TEMPS")
-                current_date = None
-                for lesson in timetable:
-                    if lesson.date != current_date:
-                        current_date = lesson.date
-                        lines.append(f"\n    {_fmt_date(lesson.date)}")
-                    time_str = f"{lesson.start_time.strftime('%H:%M')}-{lesson.end_time.strftime('%H:%M')}"
-                    room_str = f" ({lesson.room})" if lesson.room else ""
-                    lines.append(f"      {time_str:<11} {lesson.subject:<25}{room_str}")
+                # groupby only merges adjacent entries, so sort explicitly rather than
+                # relying on the fetcher's ordering
+                ordered = sorted(timetable, key=attrgetter("date", "start_time"))
+                for lesson_date, date_lessons in itertools.groupby(ordered, key=attrgetter("date")):
+                    lines.append(f"\n    {_fmt_date(lesson_date)}")
+                    for lesson in date_lessons:
+                        time_str = f"{_fmt_hm(lesson.start_time)}-{_fmt_hm(lesson.end_time)}"
+                        room_str = f" ({lesson.room})" if lesson.room else ""
+                        lines.append(f"      {time_str:<11} {lesson.subject:<25}{room_str}")
 
         # Add homeworks second
         if homeworks_by_child and child_name in homeworks_by_child:
@@ -90,48 +188,55 @@ def build_text_report(
         else:
             lines.append("\n  NOTES")
             # Group by subject for a cleaner read
-            by_subject: dict[str, list[GradeEntry]] = {}
-            for g in grades:
-                by_subject.setdefault(g.subject, []).append(g)
-
-            for subject, sg in sorted(by_subject.items()):
+            grouped = grouped_by_child[child_name] if grouped_by_child else group_by_subject(grades)
+            for subject, sg in grouped:
                 lines.append(f"\n    {subject}")
+                padded_subject = f"{subject:<25}"
                 for g in sg:
-                    lines.append(_grade_line(g))
+                    lines.append(_grade_line(g, date_cache[g.date], padded_subject))
 
-    lines.append(f"\n{'=' * 60}")
-    lines.append(f"Généré le {today.strftime('%d/%m/%Y')}")
+    lines.append("\n" + _SEP_EQ_60)
+    lines.append(f"Généré le {_fmt_ymd(today)}")
     return "\n".join(lines)
 
 
 def build_whatsapp_report(
     grades_by_child: dict[str, list[GradeEntry]],
     days: int = 14,
+    date_cache: dict[datetime.date, str] | None = None,
+    today: datetime.date | None = None,
+    by_date_desc: dict[str, list[GradeEntry]] | None = None,
 ) -> str:
     """Build a WhatsApp-friendly report with emoji and bold child names, no subject grouping."""
-    today = datetime.date.today()
+    if today is None:
+        today = datetime.date.today()
+    if date_cache is None:
+        date_cache = build_date_cache(grades_by_child, fmt=_fmt_date_whatsapp)
     lines = [
         "📊 Rapport de notes Pronote",
         f"Semaine du {_fmt_date_whatsapp(today - datetime.timedelta(days=days))} au {_fmt_date_whatsapp(today)}",
-        "=" * 50,
+        _SEP_EQ_50,
     ]
 
     for child_name, grades in grades_by_child.items():
         lines.append(f"\n👧🏻 **{child_name}**")
-        lines.append("─" * 30)
+        lines.append(_SEP_DASH_30)
 
         if not grades:
             lines.append("  Aucune note sur la période.")
             continue
 
         # Sort grades by date (most recent first) without grouping by subject
-        sorted_grades = sorted(grades, key=lambda g: g.date, reverse=True)
+        if by_date_desc:
+            sorted_grades = by_date_desc[child_name]
+        else:
+            sorted_grades = sorted(grades, key=attrgetter("date"), reverse=True)
 
         for g in sorted_grades:
-            lines.append(_grade_line_whatsapp(g))
+            lines.append(_grade_line_whatsapp(g, date_cache[g.date]))
 
-    lines.append(f"\n{'=' * 50}")
-    lines.append(f"Généré le {today.strftime('%d/%m/%Y')}")
+    lines.append("\n" + _SEP_EQ_50)
+    lines.append(f"Généré le {_fmt_ymd(today)}")
     return "\n".join(lines)
 
 
@@ -152,80 +257,50 @@ def _get_subject_color(subject: str, subject_index: int = 0) -> str:
     return _TIMETABLE_COLORS[hash(subject) % len(_TIMETABLE_COLORS)]
 
 
-def build_html_report(
-    grades_by_child: dict[str, list[GradeEntry]],
-    homeworks_by_child: dict[str, list[HomeworkEntry]] | None = None,
-    timetable_by_child: dict[str, list[TimetableEntry]] | None = None,
-    days: int = 14,
-) -> str:
-    today = datetime.date.today()
-    since = today - datetime.timedelta(days=days)
+# Page and per-child wrappers of the HTML report, parsed once at import
+_PAGE_HEAD_TPL = string.Template("""<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="UTF-8"></head>
+<body style='font-family:Arial,sans-serif;color:#333;max-width:900px;margin:auto;padding:20px;background:#f9f9f9'>
+    <h1 style='color:#2c3e50;border-bottom:3px solid #3498db;padding-bottom:10px'>📚 Rapport Pronote</h1>
+    <p style='color:#888;margin-top:0'>Du ${since} au ${today}</p>
+    <hr style='border:none;border-top:2px solid #eee;margin:20px 0'>
+    """)
 
-    children_html = ""
-    for child_name, grades in grades_by_child.items():
-        child_sections = ""
+_PAGE_FOOT_TPL = string.Template("""
+    <hr style='border:none;border-top:1px solid #eee;margin:20px 0'>
+    <p style='color:#aaa;font-size:12px'>Rapport généré automatiquement le ${today}</p>
+</body>
+</html>""")
 
-        # Timetable section FIRST
-        if timetable_by_child and child_name in timetable_by_child:
-            timetable = timetable_by_child[child_name]
-            if timetable:
-                child_sections += f"""
+_CHILD_HEAD_TPL = string.Template("""
+        <div style='margin-bottom:32px'>
+            <h2 style='margin:0 0 12px;color:#2c3e50;border-left:4px solid #3498db;padding-left:10px'>${name}</h2>
+            """)
+
+_CHILD_FOOT = """
+        </div>"""
+
+# Section fragments of the HTML report; the *_TPL ones are filled with str.format()
+_TIMETABLE_HEADER = """
         <h3 style='margin:20px 0 16px;color:#2c3e50;font-size:18px'>📅 Emploi du temps</h3>"""
-                
-                # Group lessons by date
-                lessons_by_date: dict[datetime.date, list[TimetableEntry]] = {}
-                for lesson in timetable:
-                    lessons_by_date.setdefault(lesson.date, []).append(lesson)
-                
-                if lessons_by_date:
-                    sorted_dates = sorted(lessons_by_date.keys())
-                    
-                    # Display as simple list, grouped by date
-                    for lesson_date in sorted_dates:
-                        date_lessons = sorted(lessons_by_date[lesson_date], key=lambda x: x.start_time)
-                        date_str = _fmt_date(lesson_date)
-                        
-                        child_sections += f"""
+
+_TIMETABLE_DATE_HEAD_TPL = """
         <div style='margin-bottom:16px;border:1px solid #ddd;border-radius:4px;overflow:hidden;background:#f9f9f9'>
-            <div style='background:#2c3e50;color:white;padding:10px 12px;font-weight:600'>{date_str}</div>
+            <div style='background:#2c3e50;color:white;padding:10px 12px;font-weight:600'>{date}</div>
             <div style='padding:8px 12px'>"""
-                        
-                        for lesson in date_lessons:
-                            time_str = f"{lesson.start_time.strftime('%H:%M')} - {lesson.end_time.strftime('%H:%M')}"
-                            esc_subject = escape(lesson.subject)
-                            room_str = f" • {escape(lesson.room)}" if lesson.room else ""
-                            color = _get_subject_color(lesson.subject)
-                            
-                            child_sections += f"""
+
+_TIMETABLE_LESSON_TPL = """
                 <div style='padding:8px;margin-bottom:6px;background:{color};border-left:4px solid #666;border-radius:2px'>
-                    <strong>{esc_subject}</strong>{room_str}
-                    <div style='font-size:12px;color:#666;margin-top:2px'>{time_str}</div>
+                    <strong>{subject}</strong>{room}
+                    <div style='font-size:12px;color:#666;margin-top:2px'>{time}</div>
                 </div>"""
-                        
-                        child_sections += """
+
+_TIMETABLE_DATE_FOOT = """
             </div>
         </div>"""
 
-        # Homeworks section SECOND
-        if homeworks_by_child and child_name in homeworks_by_child:
-            homeworks = homeworks_by_child[child_name]
-            if homeworks:
-                hw_rows = ""
-                for hw in homeworks:
-                    status_icon = "✓" if hw.done else "⭕"
-                    status_color = "#27ae60" if hw.done else "#e74c3c"
-                    status_bg = "#f0f8f0" if hw.done else "#fff5f5"
-                    esc_subject = escape(hw.subject)
-                    esc_desc = escape(hw.description) if hw.description else ""
-                    desc_row = f"<tr style='background:#fafafa'><td colspan='3' style='padding:6px 12px;border-bottom:1px solid #f0f0f0;color:#666;font-size:12px'><em>{esc_desc}</em></td></tr>" if esc_desc else ""
-                    hw_rows += f"""
-                <tr style='background:{status_bg};border-bottom:1px solid #f0f0f0'>
-                    <td style='padding:8px 12px;color:{status_color};font-weight:bold;width:30px;text-align:center'>{status_icon}</td>
-                    <td style='padding:8px 12px'>{esc_subject}</td>
-                    <td style='padding:8px 12px;text-align:right'>{_fmt_date(hw.due_date)}</td>
-                </tr>{desc_row}"""
-
-                child_sections += f"""
+_HW_TABLE_HEAD = """
         <h3 style='margin:20px 0 16px;color:#2c3e50;font-size:18px'>📝 Devoirs</h3>
         <table style='width:100%;border-collapse:collapse;font-size:14px;border:1px solid #ddd;border-radius:4px;overflow:hidden'>
             <thead>
@@ -235,39 +310,27 @@ def build_html_report(
                     <th style='padding:10px 12px;font-weight:600;text-align:right'>À faire pour le</th>
                 </tr>
             </thead>
-            <tbody>{hw_rows}</tbody>
+            <tbody>"""
+
+_HW_ROW_TPL = """
+                <tr style='background:{status_bg};border-bottom:1px solid #f0f0f0'>
+                    <td style='padding:8px 12px;color:{status_color};font-weight:bold;width:30px;text-align:center'>{status_icon}</td>
+                    <td style='padding:8px 12px'>{subject}</td>
+                    <td style='padding:8px 12px;text-align:right'>{due}</td>
+                </tr>{desc_row}"""
+
+_HW_DESC_TPL = "<tr style='background:#fafafa'><td colspan='3' style='padding:6px 12px;border-bottom:1px solid #f0f0f0;color:#666;font-size:12px'><em>{desc}</em></td></tr>"
+
+_HW_TABLE_FOOT = """</tbody>
         </table>"""
 
-        # Grades section LAST
-        if not grades:
-            grades_block = "<p style='color:#888'>Aucune note sur la période.</p>"
-        else:
-            by_subject: dict[str, list[GradeEntry]] = {}
-            for g in grades:
-                by_subject.setdefault(g.subject, []).append(g)
+_GRADES_HEADER = """
+        <h3 style='margin:20px 0 16px;color:#2c3e50;font-size:18px'>📊 Notes</h3>
+        """
 
-            rows = ""
-            for subject, sg in sorted(by_subject.items()):
-                first = True
-                for g in sg:
-                    esc_subject = escape(subject)
-                    esc_grade = escape(g.grade)
-                    esc_out_of = escape(g.out_of)
-                    bonus = " <span style='color:#e67e22;font-size:11px'>[BONUS]</span>" if g.is_bonus else ""
-                    coeff = f"<br><small style='color:#888'>coeff {escape(g.coefficient)}</small>" if g.coefficient and g.coefficient != "1" else ""
-                    comment = f"<br><small style='color:#888;font-style:italic'>{escape(g.comment)}</small>" if g.comment else ""
-                    avg_display = escape(g.average) if g.average else "—"
-                    rows += f"""
-                <tr style='border-bottom:1px solid #f0f0f0'>
-                    <td style='padding:8px 12px;color:#555'>{'<b>' + esc_subject + '</b>' if first else ''}</td>
-                    <td style='padding:8px 12px'>{_fmt_date(g.date)}</td>
-                    <td style='padding:8px 12px;text-align:center;font-weight:bold'>{esc_grade}/{esc_out_of}{bonus}{coeff}</td>
-                    <td style='padding:8px 12px;text-align:center;color:#888'>{avg_display}</td>
-                    <td style='padding:8px 12px;color:#666'>{comment}</td>
-                </tr>"""
-                    first = False
+_NO_GRADES = "<p style='color:#888'>Aucune note sur la période.</p>"
 
-            grades_block = f"""
+_GRADE_TABLE_HEAD = """
             <table style='width:100%;border-collapse:collapse;font-size:14px;border:1px solid #ddd;border-radius:4px;overflow:hidden'>
                 <thead>
                     <tr style='background:#34495e;color:white'>
@@ -278,28 +341,152 @@ def build_html_report(
                         <th style='padding:10px 12px;font-weight:600;text-align:left'>Commentaire</th>
                     </tr>
                 </thead>
-                <tbody>{rows}</tbody>
+                <tbody>"""
+
+_GRADE_TABLE_FOOT = """</tbody>
             </table>"""
 
-        child_sections += f"""
-        <h3 style='margin:20px 0 16px;color:#2c3e50;font-size:18px'>📊 Notes</h3>
-        {grades_block}"""
+# One grade row of the HTML report, filled with str.format_map()
+_GRADE_ROW_TPL = """
+                <tr style='border-bottom:1px solid #f0f0f0'>
+                    <td style='padding:8px 12px;color:#555'>{subject}</td>
+                    <td style='padding:8px 12px'>{date}</td>
+                    <td style='padding:8px 12px;text-align:center;font-weight:bold'>{grade}/{out_of}{bonus}{coeff}</td>
+                    <td style='padding:8px 12px;text-align:center;color:#888'>{average}</td>
+                    <td style='padding:8px 12px;color:#666'>{comment}</td>
+                </tr>"""
 
-        children_html += f"""
-        <div style='margin-bottom:32px'>
-            <h2 style='margin:0 0 12px;color:#2c3e50;border-left:4px solid #3498db;padding-left:10px'>{escape(child_name)}</h2>
-            {child_sections}
-        </div>"""
+_GRADE_BONUS_HTML = " <span style='color:#e67e22;font-size:11px'>[BONUS]</span>"
+_GRADE_COEFF_TPL = "<br><small style='color:#888'>coeff {coeff}</small>"
+_GRADE_COMMENT_TPL = "<br><small style='color:#888;font-style:italic'>{comment}</small>"
+
+
+def iter_html_report(
+    grades_by_child: dict[str, list[GradeEntry]],
+    homeworks_by_child: dict[str, list[HomeworkEntry]] | None = None,
+    timetable_by_child: dict[str, list[TimetableEntry]] | None = None,
+    days: int = 14,
+    date_cache: dict[datetime.date, str] | None = None,
+    today: datetime.date | None = None,
+    grouped_by_child: dict[str, list[tuple[str, list[GradeEntry]]]] | None = None,
+) -> Iterator[str]:
+    """Yield the HTML report piece by piece, so it never has to be held as one string."""
+    if today is None:
+        today = datetime.date.today()
+    if date_cache is None:
+        date_cache = build_date_cache(grades_by_child)
+    since = today - datetime.timedelta(days=days)
+    # Local aliases: the loops below call these for every lesson, homework and grade
+    _escape = _esc
+    _fmt = _fmt_date
+
+    yield _PAGE_HEAD_TPL.substitute(since=_fmt_ymd(since), today=_fmt_ymd(today))
+
+    for child_name, grades in grades_by_child.items():
+        yield _CHILD_HEAD_TPL.substitute(name=_escape(child_name))
+
+        # Timetable section FIRST
+        if timetable_by_child and child_name in timetable_by_child:
+            timetable = timetable_by_child[child_name]
+            if timetable:
+                yield _TIMETABLE_HEADER
+                subject_colors = {subject: _get_subject_color(subject) for subject in {l.subject for l in timetable}}
+                
+                # Display as simple list, grouped by date (one sort, then contiguous runs per day)
+                ordered = sorted(timetable, key=attrgetter("date", "start_time"))
+                for lesson_date, date_lessons in itertools.groupby(ordered, key=attrgetter("date")):
+                    yield _TIMETABLE_DATE_HEAD_TPL.format(date=_fmt(lesson_date))
+
+                    for lesson in date_lessons:
+                        yield _TIMETABLE_LESSON_TPL.format(
+                            color=subject_colors[lesson.subject],
+                            subject=_escape(lesson.subject),
+                            room=f" • {_escape(lesson.room)}" if lesson.room else "",
+                            time=f"{_fmt_hm(lesson.start_time)} - {_fmt_hm(lesson.end_time)}",
+                        )
+
+                    yield _TIMETABLE_DATE_FOOT
+
+        # Homeworks section SECOND
+        if homeworks_by_child and child_name in homeworks_by_child:
+            homeworks = homeworks_by_child[child_name]
+            if homeworks:
+                yield _HW_TABLE_HEAD
+                # One fragment for all rows: str.join drives the generator in C
+                yield "".join(
+                    _HW_ROW_TPL.format(
+                        status_bg="#f0f8f0" if hw.done else "#fff5f5",
+                        status_color="#27ae60" if hw.done else "#e74c3c",
+                        status_icon="✓" if hw.done else "⭕",
+                        subject=_escape(hw.subject),
+                        due=_fmt(hw.due_date),
+                        desc_row=_HW_DESC_TPL.format(desc=_escape(hw.description)) if hw.description else "",
+                    )
+                    for hw in homeworks
+                )
+                yield _HW_TABLE_FOOT
+
+        # Grades section LAST
+        yield _GRADES_HEADER
+        if not grades:
+            yield _NO_GRADES
+        else:
+            yield _GRADE_TABLE_HEAD
+            grouped = grouped_by_child[child_name] if grouped_by_child else group_by_subject(grades)
+            row_tpl = _GRADE_ROW_TPL
+            for subject, sg in grouped:
+                # Only the first row of a subject shows its name
+                subject_cell = f"<b>{_escape(subject)}</b>"
+                yield "".join(
+                    row_tpl.format_map({
+                        "subject": "" if i else subject_cell,
+                        "date": date_cache[g.date],
+                        "grade": _escape(g.grade),
+                        "out_of": _escape(g.out_of),
+                        "bonus": _GRADE_BONUS_HTML if g.is_bonus else "",
+                        "coeff": _GRADE_COEFF_TPL.format(coeff=_escape(g.coefficient)) if g.coefficient and g.coefficient != "1" else "",
+                        "average": _escape(g.average) if g.average else "—",
+                        "comment": _GRADE_COMMENT_TPL.format(comment=_escape(g.comment)) if g.comment else "",
+                    })
+                    for i, g in enumerate(sg)
+                )
+            yield _GRADE_TABLE_FOOT
+
+        yield _CHILD_FOOT
+
+    yield _PAGE_FOOT_TPL.substitute(today=_fmt_ymd(today))
+
+
+def write_html_report(
+    out: IO[str],
+    grades_by_child: dict[str, list[GradeEntry]],
+    homeworks_by_child: dict[str, list[HomeworkEntry]] | None = None,
+    timetable_by_child: dict[str, list[TimetableEntry]] | None = None,
+    days: int = 14,
+    date_cache: dict[datetime.date, str] | None = None,
+    today: datetime.date | None = None,
+    grouped_by_child: dict[str, list[tuple[str, list[GradeEntry]]]] | None = None,
+) -> None:
+    """Write the HTML report to `out` (a file, socket wrapper...) fragment by fragment."""
+    write = out.write
+    for fragment in iter_html_report(
+        grades_by_child, homeworks_by_child, timetable_by_child,
+        days=days, date_cache=date_cache, today=today, grouped_by_child=grouped_by_child,
+    ):
+        write(fragment)
+
+
+def build_html_report(
+    grades_by_child: dict[str, list[GradeEntry]],
+    homeworks_by_child: dict[str, list[HomeworkEntry]] | None = None,
+    timetable_by_child: dict[str, list[TimetableEntry]] | None = None,
+    days: int = 14,
+    date_cache: dict[datetime.date, str] | None = None,
+    today: datetime.date | None = None,
+    grouped_by_child: dict[str, list[tuple[str, list[GradeEntry]]]] | None = None,
+) -> str:
+    return "".join(iter_html_report(
+        grades_by_child, homeworks_by_child, timetable_by_child,
+        days=days, date_cache=date_cache, today=today, grouped_by_child=grouped_by_child,
+    ))
 
-    return f"""<!DOCTYPE html>
-<html lang="fr">
-<head><meta charset="UTF-8"></head>
-<body style='font-family:Arial,sans-serif;color:#333;max-width:900px;margin:auto;padding:20px;background:#f9f9f9'>
-    <h1 style='color:#2c3e50;border-bottom:3px solid #3498db;padding-bottom:10px'>📚 Rapport Pronote</h1>
-    <p style='color:#888;margin-top:0'>Du {since.strftime('%d/%m/%Y')} au {today.strftime('%d/%m/%Y')}</p>
-    <hr style='border:none;border-top:2px solid #eee;margin:20px 0'>
-    {children_html}
-    <hr style='border:none;border-top:1px solid #eee;margin:20px 0'>
-    <p style='color:#aaa;font-size:12px'>Rapport généré automatiquement le {today.strftime('%d/%m/%Y')}</p>
-</body>
-</html>"""
@@ -5,11 +5,23 @@ This module handles WhatsApp message sending completely headless without browser
 
 import os
 import json
+import re
 import requests
-from typing import Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Union
 
 from report import build_whatsapp_report
 
+_SEPARATOR_LINE_RE = re.compile(r'^\s*[─=\-]{11,}\s*$')
+_COLUMN_PADDING_RE = re.compile(r'(?<=\S) {2,}')
+
+
+def _normalize_phone(phone_number: str) -> str:
+    """Return the number without its + prefix (Meta API expects numbers without +)."""
+    return phone_number[1:] if phone_number.startswith("+") else phone_number
+
 
 def _clean_whatsapp_text(text: str) -> str:
     """
@@ -21,25 +33,51 @@ def _clean_whatsapp_text(text: str) -> str:
     Returns:
         Cleaned text with long dash and equals lines removed
     """
-    lines = text.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Skip lines that are mostly dashes (─) or equals (=) signs
-        stripped = line.strip()
-        if len(stripped) > 10:  # Only check lines longer than 10 characters
-            # Count dashes and equals signs
-            dash_count = stripped.count('─') + stripped.count('-')
-            equals_count = stripped.count('=')
-            total_chars = len(stripped)
-            
-            # If more than 80% of the line is dashes or equals, skip it
-            if (dash_count + equals_count) / total_chars > 0.8:
-                continue
-        
-        cleaned_lines.append(line)
-    
-    return '\n'.join(cleaned_lines)
+    # Skip lines made only of dashes (─, -) or equals (=) signs, longer than 10 characters
+    return '\n'.join(line for line in text.split('\n') if not _SEPARATOR_LINE_RE.match(line))
+
+
+# Shared keep-alive session so consecutive and parallel sends reuse TLS connections to Meta.
+# Sending is not idempotent, so only answers saying the message was not taken are retried,
+# with exponential backoff and honouring Meta's Retry-After header: rate limits (429),
+# unavailability (503) and Meta's transient 500 errors, which its docs say to retry.
+# Read errors (read=0) and 502/504 gateway errors surface immediately, as the message may
+# already have been delivered and a replay would send it twice.
+_RETRY = Retry(
+    total=3,
+    read=0,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 503],
+    allowed_methods=["POST"],
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=_RETRY))
+_SESSION.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=_RETRY))
+
+
+def _build_message(
+    subject: str,
+    text_body: str,
+    grades_by_child: Optional[dict] = None,
+    days: int = 14,
+    by_date_desc: Optional[dict] = None
+) -> str:
+    """Return the cleaned WhatsApp message body for the report."""
+    # Use WhatsApp-specific formatting if grades data is provided, otherwise use fallback text
+    if grades_by_child is not None:
+        whatsapp_body = build_whatsapp_report(grades_by_child, days=days, by_date_desc=by_date_desc)
+        # The WhatsApp report already includes the emoji and title, so we don't need to add it again
+        return _clean_whatsapp_text(whatsapp_body)
+
+    # Fallback to original text body formatting. The text report pads its columns for a
+    # monospace font, so collapse that padding (indentation is kept) to shorten the message
+    cleaned_text_body = '\n'.join(
+        _COLUMN_PADDING_RE.sub(' ', line).rstrip()
+        for line in _clean_whatsapp_text(text_body).split('\n')
+    )
+    return f"📊 {subject}\n\n{cleaned_text_body}"
 
 
 def send_whatsapp_report(
@@ -47,7 +85,11 @@ def send_whatsapp_report(
     text_body: str,
     phone_number: Optional[str] = None,
     grades_by_child: Optional[dict] = None,
-    days: int = 14
+    days: int = 14,
+    message: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    normalized: bool = False,
+    by_date_desc: Optional[dict] = None
 ) -> None:
     """
     Send the report via WhatsApp using Meta Graph API (completely headless).
@@ -58,6 +100,10 @@ def send_whatsapp_report(
         phone_number: The phone number to send to (with country code, e.g. "+33123456789")
         grades_by_child: Dictionary of grades data for WhatsApp-specific formatting
         days: Number of days to include in the report
+        message: Prebuilt message body; when given, subject/text_body/grades_by_child are not used
+        session: HTTP session to send with (default: the module's shared keep-alive session)
+        normalized: Whether phone_number has already been through _normalize_phone
+        by_date_desc: Each child's grades already sorted newest first (see report.prepare_grades)
     
     Required env vars:
         META_ACCESS_TOKEN — Your Meta WhatsApp Business API access token
@@ -77,20 +123,13 @@ def send_whatsapp_report(
     access_token = os.environ["META_ACCESS_TOKEN"]
     phone_number_id = os.environ["META_PHONE_NUMBER_ID"]
     
-    # Remove + prefix from phone number if present (Meta API expects numbers without +)
-    if phone_number.startswith("+"):
-        phone_number = phone_number[1:]
+    if not normalized:
+        phone_number = _normalize_phone(phone_number)
     
-    # Use WhatsApp-specific formatting if grades data is provided, otherwise use fallback text
-    if grades_by_child is not None:
-        whatsapp_body = build_whatsapp_report(grades_by_child, days=days)
-        cleaned_text_body = _clean_whatsapp_text(whatsapp_body)
-        # The WhatsApp report already includes the emoji and title, so we don't need to add it again
-        full_message = cleaned_text_body
-    else:
-        # Fallback to original text body formatting
-        cleaned_text_body = _clean_whatsapp_text(text_body)
-        full_message = f"📊 {subject}\n\n{cleaned_text_body}"
+    if message is None:
+        message = _build_message(subject, text_body, grades_by_child, days, by_date_desc)
+    if session is None:
+        session = _SESSION
     
     # Meta Graph API endpoint
     url = f"https://graph.facebook.com/v18.0/{phone_number_id}/messages"
@@ -107,15 +146,19 @@ def send_whatsapp_report(
         "to": phone_number,
         "type": "text",
         "text": {
-            "body": full_message
+            "body": message
         }
     }
     
+    # Compact separators and raw UTF-8 (rather than \uXXXX escapes for accents and emoji)
+    # keep the request body small; requests' json= would use the spaced, ASCII-only defaults
+    data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    
     print(f"Sending WhatsApp message to +{phone_number}")
     
     try:
-        # Send WhatsApp message via Meta Graph API
-        response = requests.post(url, headers=headers, json=payload)
+        # Send WhatsApp message via Meta Graph API (transient errors are retried by the session)
+        response = session.post(url, headers=headers, data=data)
         response.raise_for_status()
         
         result = response.json()
@@ -143,7 +186,8 @@ def send_whatsapp_instant(
     text_body: str,
     phone_number: Optional[str] = None,
     grades_by_child: Optional[dict] = None,
-    days: int = 14
+    days: int = 14,
+    by_date_desc: Optional[dict] = None
 ) -> None:
     """
     Send WhatsApp message instantly using Meta Graph API.
@@ -154,19 +198,21 @@ def send_whatsapp_instant(
         phone_number: The phone number to send to (with country code)
         grades_by_child: Dictionary of grades data for WhatsApp-specific formatting
         days: Number of days to include in the report
+        by_date_desc: Each child's grades already sorted newest first (see report.prepare_grades)
     
     Note:
         With Meta Graph API, all messages are sent instantly, so this is the same as send_whatsapp_report.
     """
-    send_whatsapp_report(subject, text_body, phone_number, grades_by_child, days)
+    send_whatsapp_report(subject, text_body, phone_number, grades_by_child, days, by_date_desc=by_date_desc)
 
 
 def send_whatsapp_group(
     subject: str,
     text_body: str,
-    group_id: Optional[str] = None,
+    group_id: Optional[Union[str, list[str]]] = None,
     grades_by_child: Optional[dict] = None,
-    days: int = 14
+    days: int = 14,
+    by_date_desc: Optional[dict] = None
 ) -> None:
     """
     Send the report to multiple WhatsApp numbers (simulating group functionality).
@@ -174,36 +220,48 @@ def send_whatsapp_group(
     Args:
         subject: The subject/title of the report
         text_body: The plain text body of the report (fallback if grades_by_child not provided)
-        group_id: Comma-separated list of phone numbers (e.g. "+33123456789,+33987654321")
+        group_id: List of phone numbers, or a comma-separated string of them (e.g. "+33123456789,+33987654321")
         grades_by_child: Dictionary of grades data for WhatsApp-specific formatting
         days: Number of days to include in the report
+        by_date_desc: Each child's grades already sorted newest first (see report.prepare_grades)
     
     Required env vars:
         WHATSAPP_GROUP_NUMBERS — Comma-separated phone numbers with country codes
     
     Note:
         Meta Graph API doesn't support WhatsApp groups directly, so this sends to multiple individual numbers.
+        The messages are sent concurrently, so the total time is close to that of the slowest recipient.
     """
     if not group_id:
-        group_id = os.environ.get("WHATSAPP_GROUP_NUMBERS")
+        group_id = os.environ.get("WHATSAPP_GROUP_NUMBERS") or ""
     
-    if not group_id:
-        raise ValueError("WHATSAPP_GROUP_NUMBERS environment variable is required for group messaging")
+    # Parse comma-separated phone numbers, normalizing each one up front
+    if isinstance(group_id, str):
+        group_id = group_id.split(",")
+    phone_numbers = [_normalize_phone(num.strip()) for num in group_id if num.strip()]
     
-    # Parse comma-separated phone numbers
-    phone_numbers = [num.strip() for num in group_id.split(",")]
+    if not phone_numbers:
+        raise ValueError("WHATSAPP_GROUP_NUMBERS environment variable is required for group messaging")
     
     print(f"Sending WhatsApp message to {len(phone_numbers)} recipients")
     
-    # Send to each number individually
+    # Every recipient gets the same text, so build it once
+    message = _build_message(subject, text_body, grades_by_child, days, by_date_desc)
+    
+    # Send to each number individually, in parallel since each send is a blocking HTTPS call
     success_count = 0
-    for phone_number in phone_numbers:
-        try:
-            send_whatsapp_report(subject, text_body, phone_number, grades_by_child, days)
-            success_count += 1
-        except Exception as e:
-            print(f"ERROR: Failed to send to {phone_number} — {e}")
-            # Continue sending to other numbers even if one fails
-            continue
+    with ThreadPoolExecutor(max_workers=min(8, len(phone_numbers))) as executor:
+        futures = {
+            executor.submit(send_whatsapp_report, subject, text_body, phone_number,
+                            message=message, session=_SESSION, normalized=True): phone_number
+            for phone_number in phone_numbers
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                success_count += 1
+            except Exception as e:
+                print(f"ERROR: Failed to send to +{futures[future]} — {e}")
+                # Continue sending to other numbers even if one fails
     
     print(f"WhatsApp group messages sent successfully to {success_count}/{len(phone_numbers)} recipients")
\ No newline at end of file